@@ -4,10 +4,25 @@ Demonstra: LangChain Agents, Tools customizadas, LLMOps, Deploy-ready
 """
 
 import os
+import re
 import json
+import time
+import hashlib
+import bisect
+import difflib
 import logging
+import functools
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
+from urllib.parse import quote
+import httpx
 import requests
 
 # ============================================================================
@@ -27,14 +42,20 @@ except ImportError:
         from langchain.agents import create_react_agent
 
 from langchain.tools import Tool
+from langchain_core.agents import AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import ConfigurableField, Runnable, RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
 
 # Callback para tracking de tokens
 try:
     from langchain_community.callbacks import get_openai_callback
+    from langchain_community.callbacks.openai_info import get_openai_token_cost_for_model
 except ImportError:
     from langchain.callbacks import get_openai_callback
+    from langchain.callbacks.openai_info import get_openai_token_cost_for_model
 
 # ============================================================================
 # CONFIGURAÇÃO DE LOGGING (LLMOps)
@@ -55,6 +76,21 @@ logger = logging.getLogger(__name__)
 # TOOLS - Ferramentas que o agente pode usar
 # ============================================================================
 
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para comparação (minúsculas, sem acentos/aspas/pontuação final).
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto normalizado
+    """
+    text = unicodedata.normalize("NFKD", text.strip().strip("'\"`").strip())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.lower()).strip(" .?!")
+
+
 class CalculatorTool:
     """Ferramenta para cálculos matemáticos"""
     
@@ -119,56 +155,531 @@ class KnowledgeBaseTool:
         return f"Não encontrei informações sobre '{query}' na base de conhecimento."
 
 
+class CityIndex:
+    """
+    Índice local de cidades: aliases -> nome canônico e coordenadas.
+
+    Entradas como "São Paulo", "sao paulo" e "Sao Paulo, SP" resolvem para
+    a mesma localização, gerando uma única requisição/chave de cache.
+    Cidades fora do índice (ou com estado/país que não é o da cidade
+    indexada, como "Paris, TX") seguem para o wttr.in como escritas.
+    """
+
+    CITIES = [
+        {"name": "São Paulo", "lat": -23.55, "lon": -46.63, "aliases": ["sp", "sampa", "sao paulo"], "regions": ["sp", "brasil", "brazil", "br"]},
+        {"name": "Rio de Janeiro", "lat": -22.91, "lon": -43.17, "aliases": ["rj", "rio"], "regions": ["rj", "brasil", "brazil", "br"]},
+        {"name": "Belo Horizonte", "lat": -19.92, "lon": -43.94, "aliases": ["bh", "beaga"], "regions": ["mg", "brasil", "brazil", "br"]},
+        {"name": "Brasília", "lat": -15.79, "lon": -47.88, "aliases": ["brasilia", "df"], "regions": ["df", "brasil", "brazil", "br"]},
+        {"name": "Salvador", "lat": -12.97, "lon": -38.50, "aliases": ["ssa"], "regions": ["ba", "brasil", "brazil", "br"]},
+        {"name": "Fortaleza", "lat": -3.73, "lon": -38.52, "aliases": [], "regions": ["ce", "brasil", "brazil", "br"]},
+        {"name": "Recife", "lat": -8.05, "lon": -34.88, "aliases": [], "regions": ["pe", "brasil", "brazil", "br"]},
+        {"name": "Porto Alegre", "lat": -30.03, "lon": -51.23, "aliases": ["poa"], "regions": ["rs", "brasil", "brazil", "br"]},
+        {"name": "Curitiba", "lat": -25.43, "lon": -49.27, "aliases": ["cwb"], "regions": ["pr", "brasil", "brazil", "br"]},
+        {"name": "Manaus", "lat": -3.12, "lon": -60.02, "aliases": [], "regions": ["am", "brasil", "brazil", "br"]},
+        {"name": "Belém", "lat": -1.46, "lon": -48.49, "aliases": ["belem"], "regions": ["pa", "brasil", "brazil", "br"]},
+        {"name": "Goiânia", "lat": -16.68, "lon": -49.25, "aliases": ["goiania"], "regions": ["go", "brasil", "brazil", "br"]},
+        {"name": "Florianópolis", "lat": -27.60, "lon": -48.55, "aliases": ["floripa", "florianopolis"], "regions": ["sc", "brasil", "brazil", "br"]},
+        {"name": "Campinas", "lat": -22.91, "lon": -47.06, "aliases": [], "regions": ["sp", "brasil", "brazil", "br"]},
+        {"name": "Londres", "lat": 51.51, "lon": -0.13, "aliases": ["london"], "regions": ["uk", "england", "inglaterra"]},
+        {"name": "Nova York", "lat": 40.71, "lon": -74.01, "aliases": ["new york", "nova iorque", "nyc", "ny"], "regions": ["ny", "usa", "us", "eua"]},
+        {"name": "Paris", "lat": 48.86, "lon": 2.35, "aliases": [], "regions": ["franca", "france"]},
+        {"name": "Lisboa", "lat": 38.72, "lon": -9.14, "aliases": ["lisbon"], "regions": ["portugal", "pt"]},
+        {"name": "Tóquio", "lat": 35.68, "lon": 139.69, "aliases": ["toquio", "tokyo"], "regions": ["japao", "japan"]},
+        {"name": "Buenos Aires", "lat": -34.60, "lon": -58.38, "aliases": ["baires"], "regions": ["argentina", "ar"]},
+    ]
+
+    def __init__(self):
+        self.aliases: Dict[str, Dict[str, Any]] = {}
+        for city in self.CITIES:
+            for alias in [city["name"]] + city["aliases"]:
+                self.aliases[normalize_text(alias)] = city
+
+    def split(self, text: str) -> List[str]:
+        """
+        Separa uma lista de cidades ("São Paulo e Rio; Londres").
+
+        Args:
+            text: Uma ou mais cidades
+
+        Returns:
+            Lista de localizações (estado/país da cidade indexada é descartado)
+        """
+        cities: List[str] = []
+        # ';', '/', ' e ' e ' and ' separam cidades ("SP e RJ")
+        for chunk in re.split(r";|/|\s+e\s+|\s+and\s+", text):
+            if chunk.strip():
+                cities.extend(self._split_commas(chunk))
+        return cities
+
+    def _split_commas(self, chunk: str) -> List[str]:
+        """
+        Separa por vírgula só quando todas as partes são conhecidas.
+
+        "Sao Paulo, SP" é uma cidade e "Rio, DF" são duas; "Berlin, Germany"
+        e "Paris, TX" não são decididos pelo índice e seguem inteiros.
+        """
+        parts = [p.strip() for p in chunk.split(",") if p.strip()]
+        cities: List[str] = []
+        entry = None
+        for part in parts:
+            key = normalize_text(part)
+            if entry is not None and key in entry["regions"]:
+                continue
+            entry = self.aliases.get(key)
+            if entry is None:
+                return [", ".join(parts)]
+            cities.append(part)
+        return cities
+
+    def resolve(self, city: str) -> Dict[str, str]:
+        """
+        Canonicaliza uma cidade.
+
+        Args:
+            city: Nome da cidade como escrito pelo usuário/LLM
+
+        Returns:
+            Dicionário com `name` (exibição), `location` (consulta ao wttr.in)
+            e `key` (chave de cache)
+        """
+        key = normalize_text(city)
+        entry = self.aliases.get(key)
+        if entry is not None:
+            location = f"{entry['lat']},{entry['lon']}"
+            return {"name": entry["name"], "location": location, "key": location}
+        name = city.strip().strip("'\"`").strip()
+        return {"name": name, "location": name, "key": key}
+
+    def cache_key(self, text: str) -> str:
+        """Chave canônica para uma entrada com uma ou mais cidades"""
+        return "|".join(self.resolve(city)["key"] for city in self.split(text))
+
+
 class WeatherTool:
     """Ferramenta para consultar clima via API pública"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        city_index: Optional[CityIndex] = None,
+        cache_ttl: float = 600,
+        max_cache_entries: int = 1000
+    ):
         self.base_url = "https://wttr.in"
+        self.city_index = city_index or CityIndex()
+        self.cache_ttl = cache_ttl
+        self.max_cache_entries = max_cache_entries
+        # Formato compacto: só as condições atuais (temp|condição|vento|umidade)
+        self.lean_format = "%t|%C|%w|%h"
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather")
+        self.stats = {"requests": 0, "cache_hits": 0, "bytes": 0, "parse_seconds": 0.0}
+        # Chaves vêm de texto livre do LLM: cache limitado por TTL e LRU
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _evict(self, now: float) -> None:
+        """Remove entradas expiradas (TTL) e excedentes (LRU). Requer o lock."""
+        # Ordenado por último acesso: expiradas atrás de uma entrada válida
+        # saem no próximo acesso a elas ou pelo limite de tamanho
+        while self._cache:
+            stored_at, _ = next(iter(self._cache.values()))
+            if now - stored_at < self.cache_ttl:
+                break
+            self._cache.popitem(last=False)
+        
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+    
+    @staticmethod
+    def _wire_bytes(response: requests.Response) -> int:
+        """Bytes do corpo transferidos (comprimidos, se houver gzip)"""
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit():
+            return int(length)
+        # Sem Content-Length (chunked): bytes lidos do stream bruto
+        return response.raw.tell()
     
     def get_weather(self, city: str) -> str:
         """
-        Consulta o clima de uma cidade.
+        Consulta o clima de uma ou mais cidades.
         
         Args:
-            city: Nome da cidade
+            city: Nome da cidade (várias podem ser separadas por ';' ou 'e')
         
         Returns:
             Informações do clima ou mensagem de erro
         """
+        cities = self.city_index.split(city) or [city]
+        if len(cities) == 1:
+            return self._get_single(cities[0])
+        
+        # Várias cidades: requisições em paralelo
+        logger.info(f"[WEATHER] Consulta em lote: {cities}")
+        return "\n\n".join(self.executor.map(self._get_single, cities))
+    
+    def _get_single(self, city: str) -> str:
+        """Consulta o clima de uma única cidade (com cache por localização)"""
         try:
-            logger.info(f"[WEATHER] Consultando clima: {city}")
-            # wttr.in é uma API pública que não requer chave
-            response = requests.get(
-                f"{self.base_url}/{city}?format=j1",
+            resolved = self.city_index.resolve(city)
+            name, location, key = resolved["name"], resolved["location"], resolved["key"]
+            logger.info(f"[WEATHER] Consultando clima: {name} ({location})")
+            
+            with self._lock:
+                now = time.monotonic()
+                cached = self._cache.get(key)
+                if cached and now - cached[0] < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+                    logger.info(f"[WEATHER] Cache: {name}")
+                    return cached[1]
+                self._cache.pop(key, None)
+                self._evict(now)
+            
+            # wttr.in é uma API pública que não requer chave ('m' = sistema métrico)
+            response = self.session.get(
+                f"{self.base_url}/{quote(location, safe=',')}?m&format={quote(self.lean_format)}",
                 timeout=5
             )
             
             if response.status_code == 200:
-                data = response.json()
-                current = data['current_condition'][0]
+                parse_start = time.perf_counter()
+                fields = [f.strip() for f in response.text.strip().split("|")]
+                if len(fields) != 4:
+                    return f"Não consegui obter o clima para {name}"
+                temp, condition, wind, humidity = fields
+                temp = temp.lstrip("+").replace("°C", "")
+                wind = re.sub(r"[^\d]", "", wind)
+                humidity = humidity.rstrip("%")
+                parse_seconds = time.perf_counter() - parse_start
                 
                 result = (
-                    f"Clima em {city}:\n"
-                    f"🌡️ Temperatura: {current['temp_C']}°C\n"
-                    f"☁️ Condição: {current['weatherDesc'][0]['value']}\n"
-                    f"💨 Vento: {current['windspeedKmph']} km/h\n"
-                    f"💧 Umidade: {current['humidity']}%"
+                    f"Clima em {name}:\n"
+                    f"🌡️ Temperatura: {temp}°C\n"
+                    f"☁️ Condição: {condition}\n"
+                    f"💨 Vento: {wind} km/h\n"
+                    f"💧 Umidade: {humidity}%"
+                )
+                
+                wire_bytes = self._wire_bytes(response)
+                with self._lock:
+                    now = time.monotonic()
+                    self._cache[key] = (now, result)
+                    self._cache.move_to_end(key)
+                    self._evict(now)
+                    self.stats["requests"] += 1
+                    self.stats["bytes"] += wire_bytes
+                    self.stats["parse_seconds"] += parse_seconds
+                
+                logger.info(
+                    f"[WEATHER] Sucesso: {name} "
+                    f"({wire_bytes} bytes, parse {parse_seconds * 1000:.3f} ms)"
                 )
-                logger.info(f"[WEATHER] Sucesso: {city}")
                 return result
             else:
-                return f"Não consegui obter o clima para {city}"
+                return f"Não consegui obter o clima para {name}"
         except Exception as e:
             logger.error(f"[WEATHER] Erro: {str(e)}")
             return f"Erro ao consultar clima: {str(e)}"
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Métricas de transferência e parsing das consultas.
+        
+        Returns:
+            Dicionário com requisições, acertos de cache, bytes e tempo de parse
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cache_entries"] = len(self._cache)
+        requests_made = stats["requests"] or 1
+        stats["avg_bytes"] = stats["bytes"] / requests_made
+        stats["avg_parse_ms"] = stats["parse_seconds"] * 1000 / requests_made
+        return stats
+
+
+class CoinIndex:
+    """
+    Índice local das moedas da CoinGecko (id, símbolo e nome).
+
+    A lista completa de moedas é persistida em disco e atualizada
+    periodicamente em background, então a resolução de nomes/símbolos
+    acontece em memória, sem chamadas de rede. Símbolos ambíguos (ex: 'uni')
+    são ordenados pelo ranking de market cap.
+    """
+
+    # Usado enquanto o índice completo não foi carregado (ex: primeira execução offline)
+    SEED_COINS = [
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "rank": 1},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum", "rank": 2},
+        {"id": "tether", "symbol": "usdt", "name": "Tether", "rank": 3},
+        {"id": "binancecoin", "symbol": "bnb", "name": "BNB", "rank": 4},
+        {"id": "solana", "symbol": "sol", "name": "Solana", "rank": 5},
+        {"id": "ripple", "symbol": "xrp", "name": "XRP", "rank": 6},
+        {"id": "cardano", "symbol": "ada", "name": "Cardano", "rank": 9},
+        {"id": "dogecoin", "symbol": "doge", "name": "Dogecoin", "rank": 8},
+    ]
+
+    def __init__(
+        self,
+        index_path: str = "coin_index.json",
+        refresh_interval: float = 24 * 3600,
+        ranked_pages: int = 4,
+        auto_refresh: bool = True
+    ):
+        """
+        Inicializa o índice, carregando a versão persistida se existir.
+
+        Args:
+            index_path: Caminho do arquivo JSON do índice
+            refresh_interval: Intervalo entre atualizações (segundos)
+            ranked_pages: Páginas de 250 moedas buscadas para o ranking de market cap
+            auto_refresh: Atualiza em background quando o índice está ausente/antigo
+        """
+        self.base_url = "https://api.coingecko.com/api/v3"
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+        self.ranked_pages = ranked_pages
+        self.updated_at = 0.0
+
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._data = self._build(self.SEED_COINS)
+
+        self._load()
+        if auto_refresh:
+            self.start_background_refresh()
+
+    # ------------------------------------------------------------------
+    # Construção e persistência
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _rank_key(coin: Dict[str, Any]):
+        rank = coin.get("rank")
+        return (rank is None, rank or 0, coin["id"])
+
+    def _build(self, coins: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Monta as estruturas de busca (exata, prefixo) a partir da lista de moedas"""
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_key: Dict[str, List[Dict[str, Any]]] = {}
+
+        for coin in sorted(coins, key=self._rank_key):
+            by_id[coin["id"]] = coin
+            for key in {coin["id"], coin["symbol"].lower(), coin["name"].lower()}:
+                by_key.setdefault(key, []).append(coin)
+
+        # Busca aproximada só compara chaves com a mesma letra inicial
+        buckets: Dict[str, List[str]] = {}
+        for key in by_key:
+            buckets.setdefault(key[:1], []).append(key)
+
+        return {
+            "by_id": by_id,
+            "by_key": by_key,
+            # Chaves ordenadas permitem busca por prefixo com bisect
+            "sorted_keys": sorted(by_key),
+            "buckets": buckets,
+            # Memo das buscas aproximadas (descartado a cada reconstrução)
+            "fuzzy_cache": {},
+        }
+
+    def _load(self) -> None:
+        """Carrega o índice persistido em disco"""
+        if not os.path.exists(self.index_path):
+            logger.info(f"[COIN_INDEX] Índice não encontrado em {self.index_path}")
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            self._data = self._build(payload["coins"])
+            self.updated_at = payload.get("updated_at", 0.0)
+            logger.info(f"[COIN_INDEX] {len(payload['coins'])} moedas carregadas de {self.index_path}")
+        except Exception as e:
+            logger.error(f"[COIN_INDEX] Erro ao carregar índice: {str(e)}")
+
+    def refresh(self) -> bool:
+        """
+        Baixa a lista completa de moedas e o ranking de market cap.
+
+        Returns:
+            True se o índice foi atualizado, False em caso de erro
+        """
+        with self._refresh_lock:
+            try:
+                logger.info("[COIN_INDEX] Atualizando índice de moedas")
+                response = requests.get(f"{self.base_url}/coins/list", timeout=30)
+                response.raise_for_status()
+                coins = [
+                    {"id": c["id"], "symbol": c["symbol"], "name": c["name"], "rank": None}
+                    for c in response.json()
+                ]
+
+                ranks: Dict[str, int] = {}
+                for page in range(1, self.ranked_pages + 1):
+                    response = requests.get(
+                        f"{self.base_url}/coins/markets",
+                        params={
+                            "vs_currency": "usd",
+                            "order": "market_cap_desc",
+                            "per_page": 250,
+                            "page": page
+                        },
+                        timeout=30
+                    )
+                    if response.status_code != 200:
+                        # Rate limit: mantém o ranking parcial obtido até aqui
+                        break
+                    for market in response.json():
+                        if market.get("market_cap_rank"):
+                            ranks[market["id"]] = market["market_cap_rank"]
+
+                for coin in coins:
+                    coin["rank"] = ranks.get(coin["id"])
+
+                self._data = self._build(coins)
+                self.updated_at = time.time()
+
+                # Escrita atômica para não corromper o índice em caso de falha.
+                # Temporário único: vários índices podem apontar para o mesmo arquivo
+                directory, filename = os.path.split(os.path.abspath(self.index_path))
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{filename}.", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump({"updated_at": self.updated_at, "coins": coins}, f)
+                    os.replace(tmp_path, self.index_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+
+                logger.info(f"[COIN_INDEX] Índice atualizado: {len(coins)} moedas, {len(ranks)} ranqueadas")
+                return True
+            except Exception as e:
+                logger.error(f"[COIN_INDEX] Erro ao atualizar índice: {str(e)}")
+                return False
+
+    def is_stale(self) -> bool:
+        """Verifica se o índice precisa ser atualizado"""
+        return time.time() - self.updated_at > self.refresh_interval
+
+    def start_background_refresh(self) -> None:
+        """Inicia a thread de atualização periódica do índice"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop_event.is_set():
+                if self.is_stale() and not self.refresh():
+                    # Em caso de falha, tenta novamente em 10 minutos
+                    self._stop_event.wait(600)
+                    continue
+                # Próxima atualização quando o índice (carregado ou baixado) vencer
+                self._stop_event.wait(max(self.updated_at + self.refresh_interval - time.time(), 0))
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=loop, name="coin-index-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Interrompe a atualização em background"""
+        self._stop_event.set()
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca moedas por id, símbolo ou nome (exata, prefixo e aproximada).
+
+        Args:
+            query: Nome, símbolo ou id da moeda
+            limit: Número máximo de resultados
+
+        Returns:
+            Lista de moedas (id, symbol, name, rank) ordenada por relevância
+        """
+        key = query.strip().lower()
+        if not key:
+            return []
+        data = self._data
+        by_key = data["by_key"]
+
+        # 1. Busca exata, ordenada por market cap. O id só passa na frente se
+        #    for ranqueado ou se nenhum candidato for (ex: 'sol' -> solana)
+        exact = self.lookup(key)
+        if exact:
+            exact_id = data["by_id"].get(key)
+            has_ranked = any(c.get("rank") is not None for c in exact)
+            if exact_id is not None and (exact_id.get("rank") is not None or not has_ranked):
+                exact = [exact_id] + [c for c in exact if c is not exact_id]
+            return exact[:limit]
+
+        # 2. Busca por prefixo (ex: 'ethere' -> ethereum)
+        if len(key) >= 3:
+            sorted_keys = data["sorted_keys"]
+            start = bisect.bisect_left(sorted_keys, key)
+            found: Dict[str, Dict[str, Any]] = {}
+            for candidate in sorted_keys[start:start + 200]:
+                if not candidate.startswith(key):
+                    break
+                for coin in by_key[candidate]:
+                    found[coin["id"]] = coin
+            if found:
+                return sorted(found.values(), key=self._rank_key)[:limit]
+
+        # 3. Busca aproximada (erros de digitação, ex: 'etherium')
+        fuzzy_cache = data["fuzzy_cache"]
+        close = fuzzy_cache.get(key)
+        if close is None:
+            candidates = [
+                k for k in data["buckets"].get(key[:1], [])
+                if abs(len(k) - len(key)) <= 2
+            ]
+            close = difflib.get_close_matches(key, candidates, n=5, cutoff=0.8)
+            if len(fuzzy_cache) < 10000:
+                fuzzy_cache[key] = close
+
+        found = {}
+        for candidate in close:
+            for coin in by_key[candidate]:
+                found.setdefault(coin["id"], coin)
+        return list(found.values())[:limit]
+
+    def lookup(self, key: str) -> List[Dict[str, Any]]:
+        """
+        Busca exata (id, símbolo ou nome), sem prefixo nem aproximação.
+
+        Args:
+            key: Termo já em minúsculas
+
+        Returns:
+            Moedas com essa chave, ordenadas por market cap
+        """
+        return self._data["by_key"].get(key, [])
+
+    def resolve(self, query: str) -> Optional[str]:
+        """
+        Resolve um nome ou símbolo para o id da CoinGecko.
+
+        Args:
+            query: Nome, símbolo ou id da moeda
+
+        Returns:
+            Id da moeda ou None se não encontrada
+        """
+        matches = self.search(query, limit=1)
+        return matches[0]["id"] if matches else None
 
 
 class CryptoTool:
     """Ferramenta para consultar preços de criptomoedas"""
-    
-    def __init__(self):
+
+    def __init__(self, coin_index: Optional[CoinIndex] = None):
         self.base_url = "https://api.coingecko.com/api/v3"
-    
+        self.coin_index = coin_index or CoinIndex()
+        self.session = requests.Session()
+
     def get_price(self, crypto: str) -> str:
         """
         Consulta o preço de uma criptomoeda.
@@ -182,20 +693,13 @@ class CryptoTool:
         try:
             logger.info(f"[CRYPTO] Consultando preço: {crypto}")
             
-            # Mapeamento de símbolos comuns
-            crypto_map = {
-                "btc": "bitcoin",
-                "eth": "ethereum",
-                "usdt": "tether",
-                "bnb": "binancecoin",
-                "sol": "solana",
-                "ada": "cardano",
-                "xrp": "ripple",
-            }
-            
-            crypto_id = crypto_map.get(crypto.lower(), crypto.lower())
-            
-            response = requests.get(
+            # Resolução local de símbolo/nome -> id (sem chamada de rede)
+            key = crypto.strip().lower()
+            matches = self.coin_index.search(key, limit=4)
+            coin = matches[0] if matches else {"id": key, "symbol": key, "name": crypto.strip()}
+            crypto_id = coin["id"]
+
+            response = self.session.get(
                 f"{self.base_url}/simple/price",
                 params={
                     "ids": crypto_id,
@@ -213,12 +717,21 @@ class CryptoTool:
                     emoji = "📈" if change > 0 else "📉"
                     
                     result = (
-                        f"💰 {crypto.upper()} - Preço Atual:\n"
+                        f"💰 {coin['name']} ({coin['symbol'].upper()}, id: {crypto_id}) - Preço Atual:\n"
                         f"🇺🇸 USD: ${info['usd']:,.2f}\n"
                         f"🇧🇷 BRL: R$ {info['brl']:,.2f}\n"
                         f"{emoji} Variação 24h: {change:.2f}%"
                     )
-                    logger.info(f"[CRYPTO] Sucesso: {crypto}")
+                    if matches and not self.coin_index.lookup(key):
+                        # Prefixo/aproximação: deixa claro que houve um palpite
+                        others = ", ".join(f"{c['name']} ({c['id']})" for c in matches[1:])
+                        result += (
+                            f"\n⚠️ '{crypto.strip()}' não corresponde exatamente a nenhuma moeda; "
+                            f"usando a mais próxima ({crypto_id})."
+                        )
+                        if others:
+                            result += f" Outras candidatas: {others}"
+                    logger.info(f"[CRYPTO] Sucesso: {crypto} -> {crypto_id}")
                     return result
                 else:
                     return f"Criptomoeda '{crypto}' não encontrada"
@@ -246,6 +759,7 @@ class WebSearchTool:
         """
         self.api_key = api_key or os.getenv("SERPAPI_KEY")
         self.base_url = "https://serpapi.com/search"
+        self.session = requests.Session()
         
         # Log se a chave está configurada
         if self.api_key:
@@ -286,7 +800,7 @@ class WebSearchTool:
             }
             
             # Faz a requisição
-            response = requests.get(
+            response = self.session.get(
                 self.base_url,
                 params=params,
                 timeout=10
@@ -382,54 +896,828 @@ class WebSearchTool:
         return self.api_key is not None
 
 
+# ============================================================================
+# MEMÓRIA DE CONVERSA - Sessões multi-turn com tokens limitados
+# ============================================================================
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa rápida de tokens (~4 caracteres por token).
+
+    Args:
+        text: Texto a ser medido
+
+    Returns:
+        Número aproximado de tokens
+    """
+    return (len(text) + 3) // 4
+
+
+class ConversationSession:
+    """Estado de uma sessão: resumo acumulado + últimos turnos literais"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.last_access = time.monotonic()
+        # Turnos aguardando incorporação ao resumo (processados em background)
+        self.pending: List[Dict[str, str]] = []
+        self.folding = False
+        self.summary_tokens = 0
+        self.summary_cost = 0.0
+
+
+class ConversationMemory:
+    """
+    Memória de conversa por sessão com crescimento de tokens limitado.
+
+    Mantém os últimos K turnos literalmente e incorpora os turnos mais
+    antigos, um a um, em um resumo incremental. O histórico injetado no
+    prompt nunca ultrapassa `max_history_tokens`, então o custo por turno
+    fica estável mesmo em conversas longas. Sessões ociosas são removidas
+    por TTL e, acima de `max_sessions`, pela política LRU. O resumo roda
+    fora do caminho da requisição, em uma thread de background.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Callable[[str, str], str]] = None,
+        max_turns: int = 4,
+        max_history_tokens: int = 800,
+        max_summary_tokens: int = 300,
+        max_sessions: int = 5000,
+        ttl_seconds: float = 3600,
+        token_counter: Callable[[str], int] = estimate_tokens,
+        background: bool = True
+    ):
+        """
+        Inicializa a memória de conversa.
+
+        Args:
+            summarizer: Função (resumo_atual, turnos_antigos) -> novo resumo.
+                Sem ela, turnos antigos são apenas descartados.
+            max_turns: Número de turnos mantidos literalmente (K)
+            max_history_tokens: Limite rígido de tokens do histórico no prompt
+            max_summary_tokens: Limite de tokens do resumo acumulado
+            max_sessions: Número máximo de sessões em memória (LRU)
+            ttl_seconds: Tempo máximo de inatividade de uma sessão
+            token_counter: Função para contar tokens de um texto
+            background: Atualiza o resumo em background (False = síncrono)
+        """
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.token_counter = token_counter
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory") if background else None
+        self.stats = {"folds": 0, "summary_tokens": 0, "summary_cost": 0.0}
+
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """Remove sessões expiradas (TTL) e excedentes (LRU). Requer o lock."""
+        # O OrderedDict está ordenado por último acesso: basta olhar o início
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            logger.info(f"[MEMORY] Sessão expirada: {session_id}")
+
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            logger.info(f"[MEMORY] Sessão removida (LRU): {session_id}")
+
+    def _get(self, session_id: str, create: bool) -> Optional[ConversationSession]:
+        """Busca (ou cria) uma sessão e marca o acesso"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = ConversationSession(session_id)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = now
+            self._evict(now)
+            return session
+
+    @staticmethod
+    def _format_turn(turn: Dict[str, str]) -> str:
+        return f"Usuário: {turn['user']}\nAssistente: {turn['assistant']}"
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Corta o texto (mantendo o final, mais recente) até caber no limite"""
+        if self.token_counter(text) <= max_tokens:
+            return text
+        # Proporção caracteres/tokens do próprio texto
+        ratio = len(text) / max(self.token_counter(text), 1)
+        keep = max(int(max_tokens * ratio) - 1, 0)
+        return "…" + text[-keep:] if keep else ""
+
+    def get_history(self, session_id: Optional[str]) -> str:
+        """
+        Monta o histórico da sessão para o prompt, respeitando o limite de tokens.
+
+        Args:
+            session_id: Identificador da sessão (None = sem memória)
+
+        Returns:
+            Histórico formatado (string vazia se não houver)
+        """
+        if session_id is None:
+            return ""
+        session = self._get(session_id, create=False)
+        if session is None:
+            return ""
+
+        with self._lock:
+            summary = session.summary
+            turns = list(session.turns)
+
+        budget = self.max_history_tokens
+        # Cada parte extra é unida com "\n", que também consome orçamento
+        separator_cost = self.token_counter("\n")
+
+        # 1. O último turno tem prioridade: é dele que dependem follow-ups
+        #    como "e em reais?" (cortado se sozinho exceder o limite)
+        last_turn = ""
+        if turns:
+            last_turn = self._truncate(self._format_turn(turns[-1]), budget)
+            budget -= self.token_counter(last_turn)
+
+        # 2. Resumo acumulado, com prefixo e separador cobrados
+        summary_text = ""
+        if summary:
+            prefix = "Resumo da conversa anterior: "
+            available = min(self.max_summary_tokens, budget - separator_cost) - self.token_counter(prefix)
+            if available > 0:
+                summary_text = prefix + self._truncate(summary, available)
+                budget -= self.token_counter(summary_text) + separator_cost
+
+        # 3. Demais turnos literais, dos mais recentes para os mais antigos
+        older: List[str] = []
+        for turn in reversed(turns[:-1]):
+            text = self._format_turn(turn)
+            cost = self.token_counter(text) + separator_cost
+            if cost > budget:
+                break
+            older.append(text)
+            budget -= cost
+
+        parts = ([summary_text] if summary_text else []) + list(reversed(older))
+        if last_turn:
+            parts.append(last_turn)
+        return "\n".join(parts)
+
+    def add_turn(
+        self,
+        session_id: Optional[str],
+        user: str,
+        assistant: str,
+        summarizer: Optional[Callable[[str, str], str]] = None
+    ) -> Optional[Future]:
+        """
+        Registra um turno e agenda a incorporação ao resumo dos turnos que
+        saíram da janela.
+
+        Args:
+            session_id: Identificador da sessão (None = não registra)
+            user: Mensagem do usuário
+            assistant: Resposta final do assistente
+            summarizer: Sobrescreve o resumidor padrão (ex: credenciais do tenant)
+
+        Returns:
+            Future do resumo agendado em background (None se nada foi agendado)
+        """
+        summarizer = summarizer or self.summarizer
+        if session_id is None:
+            return None
+        session = self._get(session_id, create=True)
+
+        with self._lock:
+            session.turns.append({"user": user, "assistant": assistant})
+            overflow = session.turns[:-self.max_turns] if self.max_turns else list(session.turns)
+            session.turns = session.turns[len(overflow):]
+
+            if not overflow or summarizer is None:
+                return None
+            session.pending.extend(overflow)
+            # Um resumo já em andamento nesta sessão processa os novos turnos
+            if session.folding:
+                return None
+            session.folding = True
+
+        if self.executor is not None:
+            return self.executor.submit(self._fold, session, summarizer)
+        self._fold(session, summarizer)
+        return None
+
+    def _fold(self, session: ConversationSession, summarizer: Callable[[str, str], str]) -> None:
+        """Incorpora os turnos pendentes ao resumo (um resumo por vez por sessão)"""
+        while True:
+            with self._lock:
+                if not session.pending:
+                    session.folding = False
+                    return
+                pending, session.pending = session.pending, []
+                previous_summary = session.summary
+
+            # Resumo incremental: só os turnos que saíram da janela são processados
+            old_turns = "\n".join(self._format_turn(t) for t in pending)
+            with get_openai_callback() as cb:
+                try:
+                    new_summary = summarizer(previous_summary, old_turns)
+                except Exception as e:
+                    logger.error(f"[MEMORY] Erro ao resumir sessão {session.session_id}: {str(e)}")
+                    new_summary = f"{previous_summary}\n{old_turns}".strip()
+
+            with self._lock:
+                session.summary = self._truncate(new_summary.strip(), self.max_summary_tokens)
+                session.summary_tokens += cb.total_tokens
+                session.summary_cost += cb.total_cost
+                self.stats["folds"] += 1
+                self.stats["summary_tokens"] += cb.total_tokens
+                self.stats["summary_cost"] += cb.total_cost
+            logger.info(f"[MEMORY] Resumo atualizado: {session.session_id}")
+
+    def get_session_stats(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Custo acumulado dos resumos de uma sessão.
+
+        Args:
+            session_id: Identificador da sessão
+
+        Returns:
+            Dicionário com tokens e custo gastos em resumos
+        """
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id is not None else None
+            if session is None:
+                return {"summary_tokens": 0, "summary_cost": 0.0}
+            return {"summary_tokens": session.summary_tokens, "summary_cost": session.summary_cost}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Métricas acumuladas dos resumos (todas as sessões).
+
+        Returns:
+            Dicionário com número de resumos, tokens e custo
+        """
+        with self._lock:
+            return dict(self.stats)
+
+    def clear(self, session_id: str) -> None:
+        """Remove uma sessão da memória"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(time.monotonic())
+            return len(self._sessions)
+
+
+# ============================================================================
+# CASCATA DE MODELOS - Modelo rápido para roteamento, forte para a resposta
+# ============================================================================
+
+class ModelUsageCallbackHandler(BaseCallbackHandler):
+    """
+    Callback que agrega chamadas, tokens, latência e custo por modelo.
+
+    Também contabiliza as escalações da cascata a partir das tags
+    `cascade:<motivo>` aplicadas às chamadas do modelo forte, e as chamadas
+    do modelo rápido descartadas (tag `cascade_waste`).
+    """
+
+    def __init__(self):
+        self.by_model: Dict[str, Dict[str, Any]] = {}
+        self.escalations: Dict[str, int] = {}
+        self.wasted_fast_calls = 0
+        self._runs: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, tags: Optional[List[str]], invocation_params: Optional[Dict]) -> None:
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or "desconhecido"
+        with self._lock:
+            self._runs[run_id] = (model, time.perf_counter())
+            for tag in tags or []:
+                if tag.startswith("cascade:"):
+                    reason = tag.split(":", 1)[1]
+                    self.escalations[reason] = self.escalations.get(reason, 0) + 1
+                elif tag == "cascade_waste":
+                    self.wasted_fast_calls += 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs) -> None:
+        self._start(run_id, tags, kwargs.get("invocation_params"))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs) -> None:
+        self._start(run_id, tags, kwargs.get("invocation_params"))
+
+    def _stats(self, model: str) -> Dict[str, Any]:
+        return self.by_model.setdefault(model, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "total_cost": 0.0,
+            "latency_seconds": 0.0,
+        })
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage and response.generations and response.generations[0]:
+            # Em modo streaming o uso vem na própria mensagem
+            message = getattr(response.generations[0][0], "message", None)
+            usage_metadata = getattr(message, "usage_metadata", None) or {}
+            prompt_tokens = usage_metadata.get("input_tokens", 0)
+            completion_tokens = usage_metadata.get("output_tokens", 0)
+
+        with self._lock:
+            model, started = self._runs.pop(run_id, ("desconhecido", time.perf_counter()))
+            stats = self._stats(model)
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["total_tokens"] += prompt_tokens + completion_tokens
+            stats["latency_seconds"] += time.perf_counter() - started
+            try:
+                stats["total_cost"] += (
+                    get_openai_token_cost_for_model(model, prompt_tokens)
+                    + get_openai_token_cost_for_model(model, completion_tokens, is_completion=True)
+                )
+            except ValueError:
+                # Modelo sem preço conhecido
+                pass
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            model, started = self._runs.pop(run_id, ("desconhecido", time.perf_counter()))
+            stats = self._stats(model)
+            stats["calls"] += 1
+            stats["latency_seconds"] += time.perf_counter() - started
+
+
+# Configurações da requisição atual. Ficam fora do `configurable` do
+# LangChain, que é copiado para os metadados de todos os callbacks: a chave
+# do tenant não pode vazar para tracers/logs.
+request_settings: ContextVar[Optional["RequestSettings"]] = ContextVar("request_settings", default=None)
+
+
+class CascadeRouter:
+    """
+    Decide, a cada passo do ReAct, qual modelo deve gerar a próxima saída.
+
+    O modelo rápido gera todos os passos Thought/Action. O modelo forte só
+    assume quando o rápido mostra baixa confiança (erro de parsing,
+    ferramenta inexistente, input vazio) ou chega à resposta final: com
+    `final_synthesis` (padrão), o Final Answer é refeito pelo modelo forte;
+    sem ele, a resposta do rápido é aceita e consultas sem ferramentas
+    custam uma única chamada. Chamadas rápidas descartadas são
+    contabilizadas como desperdício.
+    """
+
+    def __init__(self, fast_agent: Runnable, strong_agent: Runnable, tool_names: List[str]):
+        self.fast_agent = fast_agent
+        self.strong_agent = strong_agent
+        self.tool_names = set(tool_names)
+
+    def _escalate(
+        self,
+        inputs: Dict[str, Any],
+        config: RunnableConfig,
+        reason: str,
+        wasted: bool = False
+    ):
+        logger.info(f"[CASCADE] Usando modelo forte: {reason}")
+        tags = [f"cascade:{reason}"] + (["cascade_waste"] if wasted else [])
+        return self.strong_agent.with_config(tags=tags).invoke(inputs, config)
+
+    def route(self, inputs: Dict[str, Any], config: RunnableConfig):
+        """Gera o próximo AgentAction/AgentFinish escolhendo o modelo"""
+        # Cascata é opcional por requisição (`final_model` diferente de `model`)
+        settings = request_settings.get()
+        if settings is None or not settings.cascade_enabled:
+            return self.fast_agent.invoke(inputs, config)
+
+        try:
+            output = self.fast_agent.invoke(inputs, config)
+        except OutputParserException:
+            return self._escalate(inputs, config, "erro_parsing", wasted=True)
+
+        if isinstance(output, AgentFinish):
+            if not settings.final_synthesis:
+                return output
+            # A síntese final fica com o modelo forte
+            return self._escalate(inputs, config, "resposta_final", wasted=True)
+        if output.tool not in self.tool_names:
+            return self._escalate(inputs, config, "ferramenta_invalida", wasted=True)
+        if not str(output.tool_input).strip():
+            return self._escalate(inputs, config, "input_vazio", wasted=True)
+        return output
+
+
+# ============================================================================
+# PREFETCH ESPECULATIVO - Ferramentas em paralelo com a primeira chamada ao LLM
+# ============================================================================
+
+class Speculation:
+    """Chamadas especulativas disparadas para uma única query"""
+
+    def __init__(self):
+        self.futures: Dict[tuple, Future] = {}
+        self.consumed: set = set()
+
+    def take(self, key: tuple) -> Optional[str]:
+        """Retorna o resultado especulado para a chave, se existir"""
+        future = self.futures.get(key)
+        if future is None or key in self.consumed:
+            return None
+        try:
+            # Se ainda estiver em andamento, aguarda: a chamada já começou antes
+            result = future.result()
+        except Exception:
+            return None
+        self.consumed.add(key)
+        return result
+
+
+class ToolPrefetcher:
+    """
+    Prevê, a partir da pergunta, qual ferramenta e input o LLM vai escolher
+    no primeiro passo e dispara a chamada em paralelo com o LLM.
+
+    As ferramentas são registradas via `wrap()`: quando o agente pede a
+    mesma ação prevista, a observação especulada é reaproveitada. Previsões
+    cobrem expressões aritméticas, moedas do índice local e cidades.
+    """
+
+    CRYPTO_KEYWORDS = ("preço", "preco", "cotação", "cotacao", "price", "vale", "valor")
+    # Aplicados ao texto normalizado (sem acentos). "tempo" só conta quando
+    # seguido de local/momento ("tempo em SP"), não em "tempo de viagem"
+    WEATHER_KEYWORD = re.compile(
+        r"\b(?:clima|temperatura|previsao|weather|chove|chovendo|chuva"
+        r"|tempo(?=\s+(?:em|no|na|hoje|agora|amanha|para)\b))\b"
+    )
+    PLACE_PREPOSITION = re.compile(r"\b(?:em|de|do|da|no|na|in|para)\s+")
+    TIME_WORDS = {"hoje", "agora", "amanha", "today", "now"}
+    EXPRESSION_PATTERN = re.compile(r"[\d(][\d\s.+\-*/()]*[\d)]")
+
+    def __init__(
+        self,
+        coin_index: Optional[CoinIndex] = None,
+        city_index: Optional[CityIndex] = None,
+        max_workers: int = 4
+    ):
+        """
+        Inicializa o prefetcher.
+
+        Args:
+            coin_index: Índice de moedas usado para prever e normalizar CryptoPrice
+            city_index: Índice de cidades usado para normalizar Weather
+            max_workers: Número de threads para chamadas especulativas
+        """
+        self.coin_index = coin_index
+        self.city_index = city_index
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.funcs: Dict[str, Callable[[str], str]] = {}
+        self.stats = {"queries": 0, "speculated": 0, "hits": 0, "wasted": 0}
+        self._current: ContextVar[Optional[Speculation]] = ContextVar("speculation", default=None)
+        self._lock = threading.Lock()
+
+    def _key(self, tool_name: str, tool_input: str) -> tuple:
+        """Chave canônica de uma ação (mesma ação => mesma chave)"""
+        if tool_name == "Calculator":
+            return (tool_name, re.sub(r"\s+", "", tool_input.strip("'\"` ")))
+        if tool_name == "CryptoPrice" and self.coin_index is not None:
+            coin_id = self.coin_index.resolve(normalize_text(tool_input))
+            if coin_id:
+                return (tool_name, coin_id)
+        if tool_name == "Weather" and self.city_index is not None:
+            return (tool_name, self.city_index.cache_key(tool_input))
+        return (tool_name, normalize_text(tool_input))
+
+    def predict(self, query: str) -> List[tuple]:
+        """
+        Prevê ações prováveis para a primeira iteração (heurísticas baratas).
+
+        Args:
+            query: Pergunta do usuário
+
+        Returns:
+            Lista de (nome_da_ferramenta, input)
+        """
+        predictions = []
+
+        text = normalize_text(query)
+
+        if "Weather" in self.funcs and self.city_index is not None:
+            city = self._predict_city(text)
+            if city:
+                predictions.append(("Weather", city))
+
+        # Só especula cripto com palavra-chave de preço ("preço", "cotação"...):
+        # nomes e símbolos de moedas colidem com palavras comuns
+        if (
+            "CryptoPrice" in self.funcs
+            and self.coin_index is not None
+            and any(k in text for k in self.CRYPTO_KEYWORDS)
+        ):
+            candidates = []
+            for word in re.findall(r"[a-z0-9-]{3,}", text):
+                # Busca exata apenas (sem prefixo/aproximação no caminho crítico)
+                for coin in self.coin_index.lookup(word)[:1]:
+                    rank = coin.get("rank")
+                    if rank is None:
+                        continue
+                    if word in (coin["id"], coin["name"].lower()) or (word == coin["symbol"] and rank <= 200):
+                        candidates.append((rank, word))
+            if candidates:
+                predictions.append(("CryptoPrice", min(candidates)[1]))
+
+        if "Calculator" in self.funcs:
+            for expression in self.EXPRESSION_PATTERN.findall(query):
+                if re.search(r"\d\s*[+\-*/]\s*[\d(]", expression):
+                    predictions.append(("Calculator", expression.strip()))
+                    break
+
+        return predictions
+
+    def _predict_city(self, text: str) -> Optional[str]:
+        """Cidade conhecida citada após uma palavra de clima (ou None)"""
+        keyword = self.WEATHER_KEYWORD.search(text)
+        if not keyword:
+            return None
+
+        for preposition in self.PLACE_PREPOSITION.finditer(text, keyword.end()):
+            words = re.findall(r"[\w'-]+", text[preposition.end():])
+            # "clima de hoje em Londres": ignora palavras de tempo antes da cidade
+            while words and words[0] in self.TIME_WORDS:
+                words.pop(0)
+            # Maior sequência de palavras que seja uma cidade do índice
+            for size in range(min(4, len(words)), 0, -1):
+                candidate = " ".join(words[:size])
+                if candidate in self.city_index.aliases:
+                    return candidate
+        return None
+
+    def wrap(self, tool_name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+        """
+        Registra uma ferramenta e retorna a função que consulta a especulação antes.
+
+        Args:
+            tool_name: Nome da ferramenta no agente
+            func: Função original da ferramenta
+
+        Returns:
+            Função com a mesma assinatura
+        """
+        self.funcs[tool_name] = func
+
+        @functools.wraps(func)
+        def wrapped(tool_input: str) -> str:
+            speculation = self._current.get()
+            if speculation is not None:
+                result = speculation.take(self._key(tool_name, tool_input))
+                if result is not None:
+                    logger.info(f"[PREFETCH] Acerto: {tool_name}({tool_input})")
+                    return result
+            return func(tool_input)
+
+        return wrapped
+
+    def start(self, query: str) -> Speculation:
+        """
+        Dispara as chamadas especulativas para a query atual.
+
+        Args:
+            query: Pergunta do usuário
+
+        Returns:
+            Especulação ativa (deve ser encerrada com `finish()`)
+        """
+        speculation = Speculation()
+        for tool_name, tool_input in self.predict(query):
+            key = self._key(tool_name, tool_input)
+            if key not in speculation.futures:
+                logger.info(f"[PREFETCH] Especulando: {tool_name}({tool_input})")
+                speculation.futures[key] = self.executor.submit(self.funcs[tool_name], tool_input)
+        self._current.set(speculation)
+        return speculation
+
+    def finish(self, speculation: Speculation) -> Dict[str, Any]:
+        """
+        Encerra a especulação e contabiliza acertos e chamadas desperdiçadas.
+
+        Args:
+            speculation: Especulação retornada por `start()`
+
+        Returns:
+            Métricas de especulação da query
+        """
+        self._current.set(None)
+        hits = len(speculation.consumed)
+        wasted = 0
+        for key, future in speculation.futures.items():
+            if key not in speculation.consumed and not future.cancel():
+                # Já iniciada (ou concluída) e não aproveitada
+                wasted += 1
+
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["speculated"] += len(speculation.futures)
+            self.stats["hits"] += hits
+            self.stats["wasted"] += wasted
+
+        return {
+            "speculated": len(speculation.futures),
+            "hits": hits,
+            "wasted": wasted,
+            "predictions": [f"{tool}({tool_input})" for tool, tool_input in speculation.futures],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Métricas acumuladas de especulação.
+
+        Returns:
+            Dicionário com contagens e taxa de acerto
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = stats["hits"] / stats["speculated"] if stats["speculated"] else 0.0
+        return stats
+
+
 # ============================================================================
 # REACT AGENT - Configuração do Agente
 # ============================================================================
 
-class ReActAssistant:
+@dataclass(frozen=True)
+class RequestSettings:
     """
-    Agente ReAct completo com múltiplas ferramentas e logging.
-    Demonstra o paradigma Reasoning + Acting.
-    Versão 2.0 - Agora com Web Search!
+    Configurações de uma requisição (por tenant), passadas em tempo de chamada.
+
+    Credenciais, modelos e limites ficam aqui; tudo o que é caro de construir
+    (ferramentas, prompt, agente, pools de conexão) fica no `AgentCore`.
     """
-    
+
+    openai_api_key: str = field(repr=False)
+    model: str = "gpt-3.5-turbo"
+    final_model: Optional[str] = None
+    temperature: float = 0.0
+    max_iterations: int = 5
+    max_execution_time: Optional[float] = None
+    tenant_id: Optional[str] = None
+    # Cascata: refaz o Final Answer do modelo rápido com o `final_model`
+    final_synthesis: bool = True
+
+    @property
+    def cascade_enabled(self) -> bool:
+        return self.final_model is not None and self.final_model != self.model
+
+    @property
+    def tenant(self) -> str:
+        """Identificador do tenant (padrão: derivado da chave, sem expô-la)"""
+        if self.tenant_id:
+            return self.tenant_id
+        return hashlib.sha256(self.openai_api_key.encode()).hexdigest()[:16]
+
+    def model_for(self, role: str) -> str:
+        """Modelo usado pelo papel `fast` ou `final` da cascata"""
+        if role == "final" and self.cascade_enabled:
+            return self.final_model
+        return self.model
+
+    def to_config(self) -> Dict[str, Any]:
+        """
+        Converte os limites do executor em `configurable` do LangChain.
+
+        Só entram valores não sensíveis: o LangChain copia o `configurable`
+        para os metadados dos callbacks. Chave e modelos seguem por
+        `request_settings`.
+        """
+        return {
+            "configurable": {
+                "max_iterations": self.max_iterations,
+                "max_execution_time": self.max_execution_time,
+            }
+        }
+
+
+class RequestChatModel(Runnable):
+    """
+    LLM resolvido a cada chamada a partir da requisição atual.
+
+    O agente é compilado uma única vez com este runnable; na chamada, ele
+    busca no `AgentCore` o `ChatOpenAI` do tenant (chave, modelo e
+    temperatura de `request_settings`) e delega a ele.
+    """
+
+    def __init__(self, core: "AgentCore", role: str):
+        self.core = core
+        self.role = role
+
+    def resolve(self) -> ChatOpenAI:
+        settings = request_settings.get()
+        if settings is None:
+            raise ValueError("LLM chamado fora de uma requisição (request_settings vazio)")
+        return self.core.get_llm(
+            settings.openai_api_key,
+            settings.model_for(self.role),
+            settings.temperature
+        )
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.resolve().invoke(input, config, **kwargs)
+
+
+class AgentCore:
+    """
+    Núcleo compartilhado e imutável do agente ReAct.
+
+    Ferramentas, índices, prompt, agente compilado, executor e pools de
+    conexão são construídos uma única vez. Chave da OpenAI, modelos e
+    limites chegam por requisição (`RequestSettings`), então um único core
+    atende qualquer número de tenants.
+    """
+
     def __init__(
-        self, 
-        openai_api_key: Optional[str] = None,
+        self,
         serpapi_key: Optional[str] = None,
-        model: str = "gpt-3.5-turbo"
+        memory: Optional[ConversationMemory] = None,
+        coin_index: Optional[CoinIndex] = None,
+        max_connections: int = 100,
+        max_cached_llms: int = 256,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None
     ):
         """
-        Inicializa o ReAct Assistant.
+        Inicializa o núcleo compartilhado.
         
         Args:
-            openai_api_key: Chave da API OpenAI (ou usa variável de ambiente)
             serpapi_key: Chave da API SerpAPI (ou usa variável de ambiente)
-            model: Modelo a ser usado
+            memory: Memória de conversa por sessão (padrão: resumo via LLM)
+            coin_index: Índice de criptomoedas (padrão: carregado de coin_index.json)
+            max_connections: Tamanho do pool de conexões HTTP com a OpenAI
+            max_cached_llms: Máximo de clientes ChatOpenAI (tenant, modelo) em cache
+            http_client: Cliente HTTP compartilhado (padrão: pool com max_connections)
+            http_async_client: Cliente HTTP assíncrono compartilhado (idem)
         """
-        self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY não configurada")
-        
         # Inicializa ferramentas
         self.calculator = CalculatorTool()
         self.knowledge = KnowledgeBaseTool()
         self.weather = WeatherTool()
-        self.crypto = CryptoTool()
+        self.crypto = CryptoTool(coin_index=coin_index)
         self.WebSearch = WebSearchTool(api_key=serpapi_key)
         
-        # Configura LLM
-        self.llm = ChatOpenAI(
-            temperature=0,
-            model=model,
-            api_key=self.openai_api_key
+        # Pool de conexões compartilhado por todas as instâncias do ChatOpenAI
+        # (síncrono e assíncrono; sem o assíncrono, cada ChatOpenAI criaria o seu)
+        self.http_client = http_client or httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=60
+        )
+        self.http_async_client = http_async_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=60
+        )
+        
+        # Um ChatOpenAI por (chave, modelo, temperatura), todos no mesmo pool.
+        # O cliente OpenAI guarda a chave na construção, então não dá para
+        # reaproveitar uma instância trocando só o campo da chave.
+        self.max_cached_llms = max_cached_llms
+        self._llm_cache: "OrderedDict[tuple, ChatOpenAI]" = OrderedDict()
+        self._llm_lock = threading.Lock()
+        
+        # LLMs do agente: chave, modelo e temperatura vêm de cada requisição
+        self.llm = RequestChatModel(self, "fast")
+        self.final_llm = RequestChatModel(self, "final")
+        
+        # Memória multi-turn (últimos K turnos + resumo incremental)
+        self.memory = memory or ConversationMemory()
+        
+        # Prefetch especulativo (Calculator, Weather e CryptoPrice)
+        self.prefetcher = ToolPrefetcher(
+            coin_index=self.crypto.coin_index,
+            city_index=self.weather.city_index
         )
         
         # Define as tools para o agente
         self.tools = [
             Tool(
                 name="Calculator",
-                func=self.calculator.calculate,
+                func=self.prefetcher.wrap("Calculator", self.calculator.calculate),
                 description="Útil para fazer cálculos matemáticos. Input: expressão matemática como string (ex: '2+2', '10*5+3')"
             ),
             Tool(
@@ -439,12 +1727,12 @@ class ReActAssistant:
             ),
             Tool(
                 name="Weather",
-                func=self.weather.get_weather,
-                description="Útil para consultar o clima atual de uma cidade. Input: nome da cidade como string"
+                func=self.prefetcher.wrap("Weather", self.weather.get_weather),
+                description="Útil para consultar o clima atual de uma cidade. Input: nome da cidade como string (várias cidades separadas por ';')"
             ),
             Tool(
                 name="CryptoPrice",
-                func=self.crypto.get_price,
+                func=self.prefetcher.wrap("CryptoPrice", self.crypto.get_price),
                 description="Útil para consultar preço de criptomoedas. Input: nome ou símbolo da criptomoeda (ex: 'bitcoin', 'btc', 'ethereum')"
             ),
         ]
@@ -492,19 +1780,33 @@ IMPORTANTE:
 - Para informações na base de conhecimento interna, use KnowledgeBase primeiro
 - Seja preciso e objetivo
 - Responda em português brasileiro
+- Use o histórico da conversa para resolver referências (ex: "e em reais?")
+
+Histórico da conversa:
+{chat_history}
 
 Question: {input}
 Thought: {agent_scratchpad}
 """)
         
-        # Cria o agente ReAct
-        self.agent = create_react_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=self.prompt
+        # Cria o agente ReAct. O roteador da cascata só usa o modelo forte
+        # quando a requisição define um `final_model` diferente de `model`.
+        self.router = CascadeRouter(
+            fast_agent=create_react_agent(
+                llm=self.llm,
+                tools=self.tools,
+                prompt=self.prompt
+            ),
+            strong_agent=create_react_agent(
+                llm=self.final_llm,
+                tools=self.tools,
+                prompt=self.prompt
+            ),
+            tool_names=[tool.name for tool in self.tools]
         )
+        self.agent = RunnableLambda(self.router.route)
         
-        # Executor com configurações de LLMOps
+        # Executor com configurações de LLMOps (limites definidos por requisição)
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
@@ -512,27 +1814,116 @@ Thought: {agent_scratchpad}
             max_iterations=5,
             handle_parsing_errors=True,
             return_intermediate_steps=True
+        ).configurable_fields(
+            max_iterations=ConfigurableField(id="max_iterations"),
+            max_execution_time=ConfigurableField(id="max_execution_time")
         )
         
-        logger.info(f"[AGENT] ReAct Assistant inicializado com {len(self.tools)} ferramentas")
+        logger.info(f"[AGENT] Núcleo do agente inicializado com {len(self.tools)} ferramentas")
     
-    def run(self, query: str) -> Dict[str, Any]:
+    def get_llm(self, api_key: str, model: str, temperature: float) -> ChatOpenAI:
+        """
+        Retorna o ChatOpenAI do tenant, criando-o no pool compartilhado se preciso.
+        
+        Args:
+            api_key: Chave da OpenAI do tenant
+            model: Nome do modelo
+            temperature: Temperatura
+        
+        Returns:
+            Instância em cache (LRU) para a combinação
+        """
+        key = (api_key, model, temperature)
+        with self._llm_lock:
+            llm = self._llm_cache.get(key)
+            if llm is not None:
+                self._llm_cache.move_to_end(key)
+                return llm
+            llm = ChatOpenAI(
+                api_key=api_key,
+                model=model,
+                temperature=temperature,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client
+            )
+            self._llm_cache[key] = llm
+            if len(self._llm_cache) > self.max_cached_llms:
+                self._llm_cache.popitem(last=False)
+            return llm
+    
+    def _summarize_history(self, summary: str, turns: str, settings: RequestSettings) -> str:
+        """
+        Incorpora turnos antigos ao resumo da conversa usando o LLM.
+        
+        Args:
+            summary: Resumo acumulado até agora (pode ser vazio)
+            turns: Turnos que saíram da janela de memória
+            settings: Configurações da requisição (credenciais do tenant)
+        
+        Returns:
+            Novo resumo
+        """
+        prompt = (
+            "Atualize o resumo de uma conversa incorporando os novos turnos. "
+            "Mantenha apenas fatos úteis para perguntas futuras (entidades, valores, "
+            "preferências do usuário) em no máximo 3 frases, em português.\n\n"
+            f"Resumo atual: {summary or '(vazio)'}\n\n"
+            f"Novos turnos:\n{turns}\n\n"
+            "Novo resumo:"
+        )
+        llm = self.get_llm(settings.openai_api_key, settings.model, settings.temperature)
+        return llm.invoke(prompt).content
+    
+    def run(
+        self,
+        query: str,
+        settings: RequestSettings,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Executa uma query no agente ReAct.
         
         Args:
             query: Pergunta ou tarefa do usuário
+            settings: Credenciais, modelos e limites desta requisição
+            session_id: Identificador da sessão para memória multi-turn
+                (None = execução sem histórico)
         
         Returns:
             Dicionário com resposta, steps e métricas
         """
-        logger.info(f"[AGENT] Nova query: {query}")
+        logger.info(f"[AGENT] Nova query ({settings.tenant}): {query}")
         start_time = datetime.now()
         
+        # Sessões isoladas por tenant
+        memory_key = f"{settings.tenant}:{session_id}" if session_id is not None else None
+        
         try:
+            if not settings.openai_api_key:
+                raise ValueError("OPENAI_API_KEY não configurada")
+            
+            chat_history = self.memory.get_history(memory_key)
+            usage = ModelUsageCallbackHandler()
+            config = settings.to_config()
+            config["callbacks"] = [usage]
+            
+            # Ferramentas previsíveis começam enquanto o LLM decide o 1º passo
+            speculation = self.prefetcher.start(query)
+            token = request_settings.set(settings)
+            
             # Executa com tracking de tokens
             with get_openai_callback() as cb:
-                result = self.agent_executor.invoke({"input": query})
+                try:
+                    result = self.agent_executor.invoke(
+                        {
+                            "input": query,
+                            "chat_history": chat_history or "(sem histórico)"
+                        },
+                        config=config
+                    )
+                finally:
+                    request_settings.reset(token)
+                    speculation_metrics = self.prefetcher.finish(speculation)
                 
                 # Métricas de LLMOps
                 metrics = {
@@ -540,18 +1931,38 @@ Thought: {agent_scratchpad}
                     "prompt_tokens": cb.prompt_tokens,
                     "completion_tokens": cb.completion_tokens,
                     "total_cost": cb.total_cost,
+                    "history_tokens": estimate_tokens(chat_history),
+                    # Resumos rodam em background: custo acumulado da sessão
+                    "memory": self.memory.get_session_stats(memory_key),
+                    "by_model": usage.by_model,
+                    "cascade": {
+                        "enabled": settings.cascade_enabled,
+                        "final_synthesis": settings.final_synthesis,
+                        "escalations": usage.escalations,
+                        "wasted_fast_calls": usage.wasted_fast_calls
+                    },
+                    "speculation": speculation_metrics,
                     "duration_seconds": (datetime.now() - start_time).total_seconds()
                 }
                 
                 logger.info(f"[AGENT] Métricas: {json.dumps(metrics, indent=2)}")
-                
-                return {
-                    "success": True,
-                    "answer": result["output"],
-                    "intermediate_steps": result["intermediate_steps"],
-                    "metrics": metrics,
-                    "timestamp": datetime.now().isoformat()
-                }
+            
+            # O resumo roda em background, fora do caminho da resposta; seu custo
+            # aparece em metrics["memory"]. Sem resumidor próprio na memória,
+            # resume com as credenciais do tenant.
+            summarizer = None
+            if self.memory.summarizer is None:
+                summarizer = functools.partial(self._summarize_history, settings=settings)
+            self.memory.add_turn(memory_key, query, result["output"], summarizer=summarizer)
+            
+            return {
+                "success": True,
+                "answer": result["output"],
+                "intermediate_steps": result["intermediate_steps"],
+                "metrics": metrics,
+                "session_id": session_id,
+                "timestamp": datetime.now().isoformat()
+            }
         
         except Exception as e:
             logger.error(f"[AGENT] Erro: {str(e)}")
@@ -561,6 +1972,100 @@ Thought: {agent_scratchpad}
                 "timestamp": datetime.now().isoformat()
             }
     
+    def get_available_tools(self) -> List[str]:
+        """
+        Retorna lista de ferramentas disponíveis.
+        
+        Returns:
+            Lista com nomes das ferramentas
+        """
+        return [tool.name for tool in self.tools]
+
+
+class ReActAssistant:
+    """
+    Agente ReAct completo com múltiplas ferramentas e logging.
+    Demonstra o paradigma Reasoning + Acting.
+    Versão 2.0 - Agora com Web Search!
+    
+    Cada instância guarda apenas as configurações do tenant; o trabalho
+    pesado fica no `AgentCore`, que pode ser compartilhado entre instâncias.
+    """
+    
+    def __init__(
+        self, 
+        openai_api_key: Optional[str] = None,
+        serpapi_key: Optional[str] = None,
+        model: str = "gpt-3.5-turbo",
+        memory: Optional[ConversationMemory] = None,
+        final_model: Optional[str] = None,
+        core: Optional[AgentCore] = None,
+        tenant_id: Optional[str] = None,
+        final_synthesis: bool = True
+    ):
+        """
+        Inicializa o ReAct Assistant.
+        
+        Args:
+            openai_api_key: Chave da API OpenAI (ou usa variável de ambiente)
+            serpapi_key: Chave da API SerpAPI (ou usa variável de ambiente).
+                Ignorada quando `core` é informado.
+            model: Modelo a ser usado
+            memory: Memória de conversa por sessão (padrão: resumo via LLM).
+                Ignorada quando `core` é informado.
+            final_model: Modelo para a resposta final e escalações. Se diferente
+                de `model`, ativa o modo cascata (`model` vira o modelo rápido
+                dos passos intermediários)
+            core: Núcleo compartilhado (padrão: cria um núcleo próprio)
+            tenant_id: Identificador do tenant para isolar sessões
+                (padrão: derivado da chave da OpenAI)
+            final_synthesis: No modo cascata, refaz a resposta final com
+                `final_model` (False = aceita a do modelo rápido, uma chamada
+                a menos por consulta)
+        """
+        openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY não configurada")
+        
+        self.core = core or AgentCore(serpapi_key=serpapi_key, memory=memory)
+        self.settings = RequestSettings(
+            openai_api_key=openai_api_key,
+            model=model,
+            final_model=final_model,
+            tenant_id=tenant_id,
+            final_synthesis=final_synthesis
+        )
+        
+        if self.settings.cascade_enabled:
+            logger.info(f"[AGENT] Modo cascata: {model} (passos) -> {final_model} (resposta final)")
+        logger.info(f"[AGENT] ReAct Assistant inicializado com {len(self.core.tools)} ferramentas")
+    
+    @property
+    def tools(self) -> List[Tool]:
+        return self.core.tools
+    
+    @property
+    def memory(self) -> ConversationMemory:
+        return self.core.memory
+    
+    @property
+    def prefetcher(self) -> ToolPrefetcher:
+        return self.core.prefetcher
+    
+    def run(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Executa uma query no agente ReAct.
+        
+        Args:
+            query: Pergunta ou tarefa do usuário
+            session_id: Identificador da sessão para memória multi-turn
+                (None = execução sem histórico)
+        
+        Returns:
+            Dicionário com resposta, steps e métricas
+        """
+        return self.core.run(query, self.settings, session_id=session_id)
+    
     def explain_reasoning(self, result: Dict[str, Any]) -> str:
         """
         Explica o raciocínio do agente de forma legível.
@@ -593,6 +2098,21 @@ Thought: {agent_scratchpad}
         explanation += f"- Custo: ${metrics['total_cost']:.4f}\n"
         explanation += f"- Duração: {metrics['duration_seconds']:.2f}s\n"
         
+        speculation = metrics.get("speculation", {})
+        if speculation.get("speculated"):
+            explanation += (
+                f"- Prefetch: {speculation['hits']} acerto(s), "
+                f"{speculation['wasted']} chamada(s) desperdiçada(s)\n"
+            )
+        
+        # Quebra por modelo (útil no modo cascata)
+        for model_name, stats in metrics.get("by_model", {}).items():
+            explanation += (
+                f"  - {model_name}: {stats['calls']} chamadas, "
+                f"{stats['total_tokens']} tokens, {stats['latency_seconds']:.2f}s, "
+                f"${stats['total_cost']:.4f}\n"
+            )
+        
         return explanation
     
     def get_available_tools(self) -> List[str]:
@@ -602,7 +2122,7 @@ Thought: {agent_scratchpad}
         Returns:
             Lista com nomes das ferramentas
         """
-        return [tool.name for tool in self.tools]
+        return self.core.get_available_tools()
 
 
 # ============================================================================
@@ -620,9 +2140,11 @@ def create_gradio_interface():
     available_tools = assistant.get_available_tools()
     websearch_enabled = "WebSearch" in available_tools
     
-    def process_query(query: str, show_reasoning: bool = True):
+    def process_query(query: str, show_reasoning: bool = True, request: gr.Request = None):
         """Processa query e retorna resposta"""
-        result = assistant.run(query)
+        # Cada aba do navegador é uma sessão com memória própria
+        session_id = request.session_hash if request is not None else None
+        result = assistant.run(query, session_id=session_id)
         
         if show_reasoning:
             return assistant.explain_reasoning(result)
@@ -762,11 +2284,128 @@ def run_demo():
         print("Configure a variável de ambiente OPENAI_API_KEY para executar a demo")
 
 
+def _mock_openai_response(request: httpx.Request) -> httpx.Response:
+    """Resposta fixa no formato da API de chat da OpenAI (benchmark sem rede)"""
+    body = json.loads(request.content)
+    return httpx.Response(200, json={
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "Thought: sei\nFinal Answer: ok"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    })
+
+
+def run_tenant_benchmark(num_tenants: int = 100, num_cores: int = 5) -> Dict[str, float]:
+    """
+    Mede memória e tempo por tenant até a primeira resposta.
+    
+    Compara um núcleo completo por tenant (modelo antigo) com tenants
+    leves (`ReActAssistant(core=...)`) sobre um único `AgentCore`. Cada
+    tenant faz uma requisição (OpenAI simulada via `httpx.MockTransport`),
+    então a medição inclui os ChatOpenAI criados sob demanda em `get_llm`:
+    um por modelo, dois com cascata.
+    
+    Args:
+        num_tenants: Número de tenants criados sobre o núcleo compartilhado
+        num_cores: Número de núcleos completos criados para comparação
+    
+    Returns:
+        Dicionário com bytes e segundos por tenant em cada modelo
+    """
+    import contextlib
+    import gc
+    import tracemalloc
+    
+    # Sem rede: índices carregados do disco e OpenAI simulada. O cache de
+    # LLMs comporta todos os tenants, para nenhuma instância ser descartada.
+    def new_core() -> AgentCore:
+        return AgentCore(
+            coin_index=CoinIndex(auto_refresh=False),
+            max_cached_llms=3 * num_tenants + 1,
+            http_client=httpx.Client(transport=httpx.MockTransport(_mock_openai_response))
+        )
+    
+    def measure(start_tenants: Callable[[], list], count: int) -> tuple:
+        """Bytes retidos e segundos por tenant (criação + primeira requisição)"""
+        # Núcleos têm ciclos de referência: coleta antes de cada leitura
+        gc.collect()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        kept = start_tenants()
+        seconds = (time.perf_counter() - start) / count
+        gc.collect()
+        retained = (tracemalloc.get_traced_memory()[0] - before) / count
+        del kept
+        return retained, seconds
+    
+    def first_request(tenant: "ReActAssistant") -> "ReActAssistant":
+        if not tenant.run("Oi")["success"]:
+            raise RuntimeError("Requisição simulada falhou")
+        return tenant
+    
+    previous_level = logger.level
+    logger.setLevel(logging.WARNING)
+    # O AgentExecutor é verbose: descarta a saída no benchmark
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        try:
+            # Um núcleo completo por tenant
+            core_bytes, core_seconds = measure(lambda: [
+                first_request(ReActAssistant(openai_api_key=f"sk-core-{i}", core=new_core()))
+                for i in range(num_cores)
+            ], num_cores)
+            
+            # Núcleo compartilhado + configurações por tenant (aquecido antes)
+            shared = new_core()
+            first_request(ReActAssistant(openai_api_key="sk-aquecimento", core=shared))
+            tenant_bytes, tenant_seconds = measure(lambda: [
+                first_request(ReActAssistant(openai_api_key=f"sk-tenant-{i}", core=shared))
+                for i in range(num_tenants)
+            ], num_tenants)
+            cascade_bytes, cascade_seconds = measure(lambda: [
+                first_request(ReActAssistant(
+                    openai_api_key=f"sk-cascata-{i}",
+                    final_model="gpt-4o",
+                    core=shared
+                ))
+                for i in range(num_tenants)
+            ], num_tenants)
+        finally:
+            tracemalloc.stop()
+            logger.setLevel(previous_level)
+    
+    results = {
+        "full_instance_bytes": core_bytes,
+        "full_instance_seconds": core_seconds,
+        "shared_core_tenant_bytes": tenant_bytes,
+        "shared_core_tenant_seconds": tenant_seconds,
+        "shared_core_cascade_tenant_bytes": cascade_bytes,
+        "shared_core_cascade_tenant_seconds": cascade_seconds,
+    }
+    
+    print("=" * 80)
+    print("📊 Benchmark Multi-tenant (por tenant adicional, até a 1ª resposta)")
+    print("=" * 80)
+    print(f"Núcleo próprio:                 {core_bytes / 1024:10.1f} KiB  {core_seconds * 1000:8.2f} ms")
+    print(f"Núcleo compartilhado:           {tenant_bytes / 1024:10.1f} KiB  {tenant_seconds * 1000:8.2f} ms")
+    print(f"Núcleo compartilhado + cascata: {cascade_bytes / 1024:10.1f} KiB  {cascade_seconds * 1000:8.2f} ms")
+    
+    return results
+
+
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         run_demo()
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        run_tenant_benchmark()
     else:
         # Inicia interface Gradio
         demo = create_gradio_interface()
@@ -0,0 +1,301 @@
+"""
+Testes do ReAct Assistant (sem rede: LLM e HTTP simulados)
+"""
+
+import json
+import threading
+import time
+
+import httpx
+import requests
+
+import react_assistant
+from langchain.agents import create_react_agent
+from langchain.tools import Tool
+from langchain_core.agents import AgentAction
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+from langchain_core.tracers.context import collect_runs
+
+from react_assistant import (
+    AgentCore,
+    CalculatorTool,
+    CascadeRouter,
+    CityIndex,
+    CoinIndex,
+    ConversationMemory,
+    CryptoTool,
+    ModelUsageCallbackHandler,
+    RequestSettings,
+    ToolPrefetcher,
+    WeatherTool,
+    estimate_tokens,
+    request_settings,
+)
+
+
+def test_history_respects_token_cap_and_keeps_last_turn():
+    """O histórico nunca passa do limite e sempre inclui o último turno"""
+    memory = ConversationMemory(
+        summarizer=lambda summary, turns: f"{summary} {turns}",
+        max_turns=3,
+        max_history_tokens=50,
+        max_summary_tokens=30,
+        background=False
+    )
+
+    for i in range(10):
+        memory.add_turn("s1", f"pergunta {i} " * 3, f"resposta {i} " * 3)
+        history = memory.get_history("s1")
+        assert estimate_tokens(history) <= 50
+        assert f"resposta {i}" in history
+
+
+def test_summary_fold_runs_in_background():
+    """add_turn retorna sem esperar o resumidor; o resumo chega depois"""
+    release = threading.Event()
+
+    def slow_summarizer(summary, turns):
+        release.wait(5)
+        return "resumo"
+
+    memory = ConversationMemory(summarizer=slow_summarizer, max_turns=1)
+    memory.add_turn("s1", "pergunta 1", "resposta 1")
+
+    start = time.perf_counter()
+    future = memory.add_turn("s1", "pergunta 2", "resposta 2")
+    assert time.perf_counter() - start < 1
+    assert "resumo" not in memory.get_history("s1")
+
+    release.set()
+    future.result(timeout=5)
+    assert memory.get_history("s1").startswith("Resumo da conversa anterior: resumo")
+    assert memory.get_stats()["folds"] == 1
+
+
+def test_coin_index_ranks_ambiguous_exact_matches_by_market_cap(tmp_path):
+    """Um id exato não ranqueado não passa na frente de uma moeda ranqueada"""
+    index = CoinIndex(index_path=str(tmp_path / "coins.json"), auto_refresh=False)
+    index._data = index._build(CoinIndex.SEED_COINS + [
+        {"id": "sol", "symbol": "sol", "name": "Sol Junk", "rank": None},
+        {"id": "only-junk", "symbol": "ojk", "name": "Only Junk", "rank": None},
+    ])
+
+    assert [c["id"] for c in index.search("sol")] == ["solana", "sol"]
+    assert index.resolve("only-junk") == "only-junk"
+    assert index.resolve("doge") == "dogecoin"
+
+
+def _json_response(payload):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+def test_crypto_price_names_the_resolved_coin_and_flags_guesses(tmp_path):
+    crypto = CryptoTool(CoinIndex(index_path=str(tmp_path / "coins.json"), auto_refresh=False))
+    crypto.session.get = lambda url, params, timeout: _json_response({
+        params["ids"]: {"usd": 150.0, "brl": 800.0, "usd_24h_change": 1.5}
+    })
+
+    exact = crypto.get_price("sol")
+    assert exact.startswith("💰 Solana (SOL, id: solana)")
+    assert "⚠️" not in exact
+
+    guess = crypto.get_price("solanax")
+    assert guess.startswith("💰 Solana (SOL, id: solana)")
+    assert "não corresponde exatamente" in guess
+
+
+def test_coin_index_refreshes_when_persisted_index_expires(tmp_path, monkeypatch):
+    """Índice carregado do disco vence pela idade, não pelo tempo desde o início"""
+    path = tmp_path / "coins.json"
+    path.write_text(json.dumps({"updated_at": time.time() - 0.8, "coins": CoinIndex.SEED_COINS}))
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        return _json_response([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "market_cap_rank": 1}])
+
+    monkeypatch.setattr(react_assistant.requests, "get", fake_get)
+    index = CoinIndex(index_path=str(path), refresh_interval=1, ranked_pages=1)
+    try:
+        time.sleep(0.6)
+        assert calls, "índice de 0.8s com intervalo de 1s deveria ter sido atualizado"
+    finally:
+        index.stop()
+    assert json.loads(path.read_text())["coins"][0]["id"] == "bitcoin"
+    assert [f.name for f in tmp_path.iterdir()] == ["coins.json"]
+
+
+def _fake_react_agent(responses):
+    """Agente ReAct real sobre um chat model simulado"""
+    llm = FakeListChatModel(responses=responses)
+    tools = [Tool(name="Calculator", func=CalculatorTool.calculate, description="Cálculos")]
+    prompt = PromptTemplate.from_template(
+        "{tools} {tool_names}\nQuestion: {input}\nThought: {agent_scratchpad}"
+    )
+    return llm, create_react_agent(llm=llm, tools=tools, prompt=prompt)
+
+
+def test_cascade_routes_steps_on_fast_model_and_escalates_only_the_final_answer():
+    """Passos Thought/Action ficam no modelo rápido; só o Final Answer vai ao forte"""
+    fast_llm, fast_agent = _fake_react_agent([
+        "Thought: calcular\nAction: Calculator\nAction Input: 2+2",
+        "Thought: sei\nFinal Answer: 4",
+        "sobra",
+    ])
+    strong_llm, strong_agent = _fake_react_agent(["Thought: sei\nFinal Answer: quatro", "sobra"])
+    router = CascadeRouter(fast_agent, strong_agent, ["Calculator"])
+    usage = ModelUsageCallbackHandler()
+    config = {"callbacks": [usage]}
+    step = (AgentAction("Calculator", "2+2", "Action: Calculator"), "Resultado: 4")
+
+    token = request_settings.set(RequestSettings("sk-teste", model="rapido", final_model="forte"))
+    try:
+        action = router.route({"input": "2+2", "intermediate_steps": []}, config)
+        assert action.tool == "Calculator"
+        assert strong_llm.i == 0
+
+        output = router.route({"input": "2+2", "intermediate_steps": [step]}, config)
+        assert output.return_values["output"] == "quatro"
+        assert (fast_llm.i, strong_llm.i) == (2, 1)
+        assert usage.escalations == {"resposta_final": 1}
+        assert usage.wasted_fast_calls == 1
+    finally:
+        request_settings.reset(token)
+
+    # Sem síntese forte, a resposta do modelo rápido é aceita
+    fast_llm.i = 1
+    token = request_settings.set(
+        RequestSettings("sk-teste", model="rapido", final_model="forte", final_synthesis=False)
+    )
+    try:
+        output = router.route({"input": "2+2", "intermediate_steps": [step]}, config)
+        assert output.return_values["output"] == "4"
+        assert strong_llm.i == 1
+    finally:
+        request_settings.reset(token)
+
+
+def test_prefetch_only_predicts_known_cities_and_priced_coins(tmp_path):
+    """Sem cidade do índice ou palavra-chave de preço, nada é especulado"""
+    coin_index = CoinIndex(index_path=str(tmp_path / "coins.json"), auto_refresh=False)
+    prefetcher = ToolPrefetcher(coin_index=coin_index, city_index=CityIndex())
+    for name in ("Weather", "CryptoPrice", "Calculator"):
+        prefetcher.wrap(name, lambda tool_input: tool_input)
+
+    assert prefetcher.predict("Quanto tempo de viagem de São Paulo ao Rio?") == []
+    assert prefetcher.predict("Qual a temperatura de ebulição da água?") == []
+    assert prefetcher.predict("Bitcoin é um bom investimento?") == []
+    assert prefetcher.predict("clima de hoje em Londres") == [("Weather", "londres")]
+    assert prefetcher.predict("Qual o preço do Bitcoin?") == [("CryptoPrice", "bitcoin")]
+
+
+def test_city_split_keeps_aliases_that_are_also_region_codes():
+    index = CityIndex()
+    assert index.split("SP e RJ") == ["SP", "RJ"]
+    assert index.split("São Paulo; RJ") == ["São Paulo", "RJ"]
+    assert index.split("Rio, DF") == ["Rio", "DF"]
+    assert index.split("Sao Paulo, SP, Brasil") == ["Sao Paulo"]
+    # Fora do índice, "Cidade, Estado/País" é uma localização só
+    assert index.split("Washington, DC") == ["Washington, DC"]
+    assert index.split("Maceió, AL") == ["Maceió, AL"]
+    assert index.split("Berlin, Germany") == ["Berlin, Germany"]
+    assert index.split("Santa Maria, Rio Grande do Sul") == ["Santa Maria, Rio Grande do Sul"]
+    # Estado/país que não é o da cidade indexada: segue como escrito
+    assert index.split("Paris, TX") == ["Paris, TX"]
+    assert index.resolve("Paris, TX")["location"] == "Paris, TX"
+    assert index.resolve("London, CA")["location"] == "London, CA"
+    assert index.resolve("Paris")["location"] == "48.86,2.35"
+
+
+def test_weather_cache_is_bounded_and_counts_transferred_bytes():
+    class FakeSession:
+        calls = 0
+
+        def get(self, url, timeout):
+            FakeSession.calls += 1
+            response = requests.Response()
+            response.status_code = 200
+            response._content = "+21°C|Ensolarado|↑12km/h|60%".encode()
+            # Corpo chegou comprimido: 20 bytes na rede
+            response.headers["Content-Length"] = "20"
+            return response
+
+    weather = WeatherTool(max_cache_entries=2)
+    weather.session = FakeSession()
+    for city in ["Berlin", "Madrid", "Roma", "Roma"]:
+        assert "21°C" in weather.get_weather(city)
+
+    stats = weather.get_stats()
+    assert FakeSession.calls == 3
+    assert stats["cache_hits"] == 1
+    assert stats["cache_entries"] == 2
+    assert stats["bytes"] == 60
+
+    # Entradas expiradas saem do cache
+    weather.cache_ttl = 0.05
+    time.sleep(0.1)
+    weather.get_weather("Lima")
+    assert weather.get_stats()["cache_entries"] == 1
+
+
+def _mock_openai_core(tmp_path, authorizations):
+    """AgentCore cujo pool HTTP responde como a OpenAI e registra o header Authorization"""
+
+    def handler(request):
+        authorizations.append(request.headers["Authorization"])
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-teste",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Thought: sei\nFinal Answer: ok"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    return AgentCore(
+        coin_index=CoinIndex(index_path=str(tmp_path / "coins.json"), auto_refresh=False),
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+
+
+def test_each_tenant_request_sends_its_own_api_key(tmp_path):
+    authorizations = []
+    core = _mock_openai_core(tmp_path, authorizations)
+
+    first = core.run("Oi", RequestSettings("sk-tenant-A"))
+    second = core.run("Oi", RequestSettings("sk-tenant-B"))
+    again = core.run("Oi", RequestSettings("sk-tenant-A"))
+
+    assert first["success"] and second["success"] and again["success"]
+    assert first["answer"] == "ok"
+    assert authorizations == ["Bearer sk-tenant-A", "Bearer sk-tenant-B", "Bearer sk-tenant-A"]
+    # Um ChatOpenAI por tenant, reaproveitado entre requisições
+    assert len(core._llm_cache) == 2
+
+
+def test_api_key_and_models_stay_out_of_callback_metadata(tmp_path):
+    core = _mock_openai_core(tmp_path, [])
+    settings = RequestSettings("sk-tenant-secreta", model="gpt-4o-mini", final_model="gpt-4o")
+
+    with collect_runs() as collector:
+        assert core.run("Oi", settings)["success"]
+
+    runs, pending = [], list(collector.traced_runs)
+    while pending:
+        run = pending.pop()
+        runs.append(run)
+        pending.extend(run.child_runs)
+    assert any(run.run_type == "llm" for run in runs)
+    for run in runs:
+        metadata = run.extra.get("metadata", {})
+        assert "sk-tenant-secreta" not in repr(run.dict())
+        assert not {"openai_api_key", "model", "final_model"} & set(metadata)